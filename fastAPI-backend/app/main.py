@@ -1,23 +1,77 @@
-from typing import Annotated, AsyncGenerator, Optional, Literal
+from contextlib import asynccontextmanager
+from typing import Annotated, Any, AsyncGenerator, AsyncIterator, Dict, Optional, Literal
 
-from fastapi import Depends, FastAPI, status, Response, HTTPException
+from fastapi import Depends, FastAPI, status, Response, HTTPException, Request
 from fastapi.openapi.utils import get_openapi
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, HttpUrl, Field
-from redis.asyncio import Redis
+from redis.asyncio import ConnectionPool, Redis
+from redis.asyncio.client import PubSub
+from redis.exceptions import RedisError
+from arq.connections import ArqRedis
+from background_tasks.scheduling import FairJobQueue, parse_weights
+import orjson
 import uuid
 import os
-import httpx
-from background_tasks.summarizer import summarize_with_gemma3, SummarizationError
-import asyncio
+
+
+# Document records are dropped this long after creation to bound Redis memory
+DOCUMENT_TTL_SECONDS = int(os.getenv("DOCUMENT_TTL_SECONDS", "86400"))
+# Per-tenant weights, e.g. "10.0.0.5=3,10.0.0.6=0.5"; unlisted tenants weigh 1. Used to
+# order the job queue, so set it to the same value as the worker's
+TENANT_WEIGHTS = parse_weights(os.getenv("TENANT_WEIGHTS"))
+# Each open event stream holds one Redis connection for its Pub/Sub subscription
+STREAM_MAX_CONNECTIONS = int(os.getenv("STREAM_MAX_CONNECTIONS", "256"))
+# Idle streams get a comment line this often so proxies don't drop the connection
+STREAM_KEEPALIVE_SECONDS = float(os.getenv("STREAM_KEEPALIVE_SECONDS", "15"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+    # One process-wide pool; connections are opened lazily and reused across requests
+    app.state.redis_pool = ConnectionPool.from_url(
+        redis_url,
+        max_connections=64,
+        encoding="utf-8",
+        decode_responses=True,
+        socket_connect_timeout=2.0,
+        socket_timeout=2.0,
+    )
+    # Subscriptions stay open for a stream's lifetime, so they get their own pool and can't
+    # starve regular requests; no read timeout since reads block until the next event
+    app.state.stream_pool = ConnectionPool.from_url(
+        redis_url,
+        max_connections=STREAM_MAX_CONNECTIONS,
+        encoding="utf-8",
+        decode_responses=True,
+        socket_connect_timeout=2.0,
+    )
+    # arq pickles job payloads, so its client keeps raw bytes on a pool of its own; jobs are
+    # queued in fair order across submitters, and a job is pointless once its document expired
+    app.state.job_queue = FairJobQueue(
+        ArqRedis(ConnectionPool.from_url(redis_url, max_connections=16)),
+        weights=TENANT_WEIGHTS,
+        expires=DOCUMENT_TTL_SECONDS,
+    )
+    try:
+        yield
+    finally:
+        await app.state.job_queue.aclose()
+        await app.state.stream_pool.disconnect()
+        await app.state.redis_pool.disconnect()
 
 
 app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     title="LLM Summariser Service",
     version="0.1.0",
     description=(
         "Asynchronous API to fetch web content and produce concise summaries using a local "
         "Ollama model (Gemma3). Create a document with a URL to start background summarization, "
-        "then poll the document resource to retrieve progress and the final summary."
+        "then poll the document resource or follow its event stream to retrieve progress and "
+        "the final summary."
     ),
     contact={
         "name": "LLM Summariser Team",
@@ -112,23 +166,29 @@ class DocumentResponse(BaseModel):
         ge=0.0,
         le=1.0,
         description="Progress indicator from 0.0 to 1.0 across fetch, summarize, and store steps.",
-        json_schema_extra={"examples": [0.0, 0.25, 0.5, 0.75, 1.0]},
+        json_schema_extra={"examples": [0.0, 0.5, 1.0]},
     )
 
 
 # Redis dependency
-async def get_redis() -> AsyncGenerator[Redis, None]:
-    redis = Redis.from_url(
-        os.getenv("REDIS_URL", "redis://localhost:6379"),
-        encoding="utf-8",
-        decode_responses=True,
-        socket_connect_timeout=2.0,
-        socket_timeout=2.0,
-    )
-    try:
-        yield redis
-    finally:
-        await redis.aclose()
+async def get_redis(request: Request) -> AsyncGenerator[Redis, None]:
+    # Clients borrow connections from the shared pool; nothing to close per request
+    yield Redis(connection_pool=request.app.state.redis_pool)
+
+
+# Event stream dependency
+async def get_stream_redis(request: Request) -> Redis:
+    return Redis(connection_pool=request.app.state.stream_pool)
+
+
+# Job queue dependency
+async def get_job_queue(request: Request) -> FairJobQueue:
+    return request.app.state.job_queue
+
+
+def document_events_channel(document_uuid: str) -> str:
+    # Pub/Sub channel the worker publishes progress and result updates to
+    return f"document:{document_uuid}:events"
 
 
 @app.post(
@@ -140,7 +200,9 @@ async def get_redis() -> AsyncGenerator[Redis, None]:
     description=(
         "Create a new document resource by providing a name and a public URL. The server "
         "fetches the content and performs summarization asynchronously. Use the Location "
-        "header or the document UUID to poll job status and retrieve the result."
+        "header or the document UUID to poll job status and retrieve the result. "
+        f"Documents expire {DOCUMENT_TTL_SECONDS} seconds after creation; later lookups "
+        "return 404."
     ),
     responses={
         202: {
@@ -153,6 +215,8 @@ async def get_redis() -> AsyncGenerator[Redis, None]:
 )
 async def create_document(payload: DocumentCreate, 
 redis: Annotated[Redis, Depends(get_redis)],
+jobs: Annotated[FairJobQueue, Depends(get_job_queue)],
+request: Request,
 response:Response,
 ) -> DocumentResponse:
     document_uuid = str(uuid.uuid4())
@@ -167,51 +231,17 @@ response:Response,
         "data_progress": "0.0",
     }
 
-    await redis.hset(hash_key, mapping=fields)
+    # Create the record and its TTL atomically so no document is left without expiry
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hset(hash_key, mapping=fields)
+        pipe.expire(hash_key, DOCUMENT_TTL_SECONDS)
+        await pipe.execute()
     response.headers["Location"] = app.url_path_for("get_document", document_uuid=document_uuid)
 
-    async def process_document() -> None:
-        try:
-            async with httpx.AsyncClient(timeout=20, follow_redirects=True) as client:
-                fetch_resp = await client.get(
-                    str(payload.URL),
-                    headers={
-                        "User-Agent": (
-                            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                            "AppleWebKit/537.36 (KHTML, like Gecko) "
-                            "Chrome/125.0.0.0 Safari/537.36"
-                        )
-                    },
-                )
-                fetch_resp.raise_for_status()
-                content_text = fetch_resp.text
-            # 25% - content fetched
-            await redis.hset(hash_key, mapping={"data_progress": "0.25"})
-
-            # 50% - about to start summarization
-            await redis.hset(hash_key, mapping={"data_progress": "0.50"})
-
-            summary_text = await summarize_with_gemma3(content_text)
-
-            # 75% - summarization complete, about to store
-            await redis.hset(hash_key, mapping={"data_progress": "0.75"})
-
-            await redis.hset(hash_key, mapping={
-                "status": "SUCCESS",
-                "summary": summary_text,
-                "data_progress": "1.0",
-            })
-        except (httpx.HTTPError, SummarizationError, Exception):
-            await redis.hset(hash_key, mapping={
-                "status": "FAILED",
-                "summary": "",
-                "data_progress": "1.0",
-            })
-
-    # fire-and-forget background work
-    task = asyncio.create_task(process_document())
-    
-
+    # Summarization runs in the ARQ worker (background_tasks.runner); submitters, keyed by
+    # client address, share both the queue order and the worker's model slots fairly
+    tenant = request.client.host if request.client else "anonymous"
+    await jobs.enqueue_job("summarize", document_uuid, str(payload.URL), tenant, _tenant=tenant)
 
     return DocumentResponse(
         document_uuid=document_uuid,
@@ -240,28 +270,107 @@ response:Response,
 )
 async def get_document(document_uuid: str, 
 redis: Annotated[Redis, Depends(get_redis)]) -> DocumentResponse:
+    return await _load_document(redis, document_uuid)
+
+
+@app.get(
+    "/documents/{document_uuid}/stream",
+    response_class=StreamingResponse,
+    tags=["documents"],
+    summary="Stream a summarization job",
+    description=(
+        "Server-Sent Events stream of a document summarization job. The current state is "
+        "sent first, then one event per progress update; the stream ends once the job "
+        "leaves PENDING or the document expires. Each event's data is a DocumentResponse "
+        "JSON object."
+    ),
+    responses={
+        200: {"description": "Event stream opened.", "content": {"text/event-stream": {}}},
+        404: {"description": "Document not found"},
+        500: {"description": "Corrupt document record"},
+        503: {"description": "Event stream unavailable"},
+    },
+)
+async def stream_document(document_uuid: str,
+redis: Annotated[Redis, Depends(get_redis)],
+events: Annotated[Redis, Depends(get_stream_redis)]) -> StreamingResponse:
+    pubsub = events.pubsub()
+    try:
+        # Subscribe before reading the snapshot so no update falls between the two
+        await pubsub.subscribe(document_events_channel(document_uuid))
+        document = await _load_document(redis, document_uuid)
+    except RedisError as exc:
+        await pubsub.aclose()
+        raise HTTPException(status_code=503, detail="Event stream unavailable") from exc
+    except BaseException:
+        await pubsub.aclose()
+        raise
+
+    return StreamingResponse(
+        _document_events(document, pubsub, redis),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _document_events(
+    document: DocumentResponse, pubsub: PubSub, redis: Redis
+) -> AsyncIterator[bytes]:
+    try:
+        yield _sse_event(document)
+        while document.status == "PENDING":
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=STREAM_KEEPALIVE_SECONDS
+            )
+            if message is None:
+                # Nothing published for a while: re-read the record so a job that died
+                # without finalizing, or a key that expired, doesn't hold the stream open
+                try:
+                    latest = await _load_document(redis, document.document_uuid)
+                except HTTPException:
+                    return
+                if latest == document:
+                    yield b": keep-alive\n\n"
+                else:
+                    document = latest
+                    yield _sse_event(document)
+                continue
+            fields: Dict[str, Any] = orjson.loads(message["data"])
+            if "summary" in fields:
+                fields["summary"] = fields["summary"] or None
+            document = document.model_copy(update=fields)
+            yield _sse_event(document)
+    finally:
+        await pubsub.aclose()
+
+
+def _sse_event(document: DocumentResponse) -> bytes:
+    return b"data: " + orjson.dumps(document.model_dump(mode="json")) + b"\n\n"
+
+
+async def _load_document(redis: Redis, document_uuid: str) -> DocumentResponse:
     hash_key = f"document:{document_uuid}"
-    data = await redis.hgetall(hash_key)
+    # Fetch only the fields the response needs, whatever else the hash may hold
+    values = await redis.hmget(hash_key, "status", "name", "URL", "summary", "data_progress")
+    status_value, name_value, url_value, summary_value, progress_raw = values
 
-    if not data:
+    if all(value is None for value in values):
         raise HTTPException(status_code=404, detail="Document not found")
 
-    summary_value = data.get("summary")
     summary_normalized = None if summary_value in (None, "") else summary_value
-    progress_raw = data.get("data_progress", "0.0")
     try:
         progress_value = float(progress_raw)
     except (TypeError, ValueError):
         progress_value = 0.0
 
-    if "URL" not in data or "name" not in data or "status" not in data:
+    if url_value is None or name_value is None or status_value is None:
         raise HTTPException(status_code=500, detail="Corrupt document record")
 
     return DocumentResponse(
        document_uuid=document_uuid,
-       status=data["status"],
-       name=data["name"],
-       URL=data["URL"],
+       status=status_value,
+       name=name_value,
+       URL=url_value,
        summary=summary_normalized,
        data_progress=progress_value,
     )
@@ -0,0 +1,87 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Compiled single-pass versions of the summarizer's text scans.
+
+Build in place with:
+    cythonize -i background_tasks/_speedups.pyx
+
+background_tasks.summarizer falls back to equivalent pure-Python code when this
+extension isn't built.
+"""
+
+from cpython.unicode cimport Py_UNICODE_ISSPACE
+
+
+cdef inline bint _is_horizontal(Py_UCS4 ch):
+    return ch == u' ' or ch == u'\t' or ch == u'\r' or ch == u'\f' or ch == u'\v'
+
+
+cdef void _append_collapsed(list out, str text, Py_ssize_t start, Py_ssize_t end):
+    # Runs of [ \t\r\f\v] become one space; any other characters are kept as-is
+    cdef Py_ssize_t i = start
+    cdef Py_ssize_t run_start
+    while i < end:
+        if _is_horizontal(text[i]):
+            while i < end and _is_horizontal(text[i]):
+                i += 1
+            out.append(u' ')
+        else:
+            run_start = i
+            while i < end and not _is_horizontal(text[i]):
+                i += 1
+            out.append(text[run_start:i])
+
+
+cpdef str collapse_whitespace(str text):
+    """
+    Collapse horizontal whitespace runs to one space and blank-line runs to one blank line.
+
+    Same result as substituting [ \\t\\r\\f\\v]+ with " " and then \\n\\s*\\n+ with "\\n\\n",
+    in a single scan.
+    """
+    cdef Py_ssize_t n = len(text)
+    cdef Py_ssize_t i = 0
+    cdef Py_ssize_t run_start, first_nl, last_nl, j
+    cdef Py_UCS4 ch
+    cdef list out = []
+
+    while i < n:
+        ch = text[i]
+        if not Py_UNICODE_ISSPACE(ch):
+            run_start = i
+            while i < n and not Py_UNICODE_ISSPACE(text[i]):
+                i += 1
+            out.append(text[run_start:i])
+            continue
+
+        # Maximal whitespace run; locate its first and last newline
+        run_start = i
+        first_nl = -1
+        last_nl = -1
+        while i < n and Py_UNICODE_ISSPACE(text[i]):
+            if text[i] == u'\n':
+                if first_nl == -1:
+                    first_nl = i
+                last_nl = i
+            i += 1
+
+        if first_nl != -1 and last_nl != first_nl:
+            _append_collapsed(out, text, run_start, first_nl)
+            out.append(u'\n\n')
+            _append_collapsed(out, text, last_nl + 1, i)
+        else:
+            _append_collapsed(out, text, run_start, i)
+
+    return u''.join(out)
+
+
+cpdef Py_ssize_t find_last_sentence_end(str text):
+    """Index of the last '.', '?' or '!' in text, or -1 if there is none."""
+    cdef Py_ssize_t i = len(text) - 1
+    cdef Py_UCS4 ch
+    while i >= 0:
+        ch = text[i]
+        if ch == u'.' or ch == u'?' or ch == u'!':
+            return i
+        i -= 1
+    return -1
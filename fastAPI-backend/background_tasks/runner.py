@@ -0,0 +1,172 @@
+"""
+ARQ worker that runs document summarization jobs enqueued by the API.
+
+Run with:
+    python -m background_tasks.runner
+or equivalently:
+    arq background_tasks.runner.WorkerSettings
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict
+
+import httpx
+import uvloop
+from arq import run_worker
+from arq.connections import RedisSettings
+from redis.asyncio import Redis
+
+from background_tasks.scheduling import FairScheduler, parse_weights
+from background_tasks.summarizer import (
+    OLLAMA_NUM_PARALLEL,
+    aclose_summarizer,
+    summarize_with_gemma3,
+    warm_up_model,
+    SummarizationError,
+)
+
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+# Jobs run at once; more than the Ollama slots so pages are fetched while others are
+# summarized and the fair scheduler has jobs from several tenants to choose between
+ARQ_MAX_JOBS = int(os.getenv("ARQ_MAX_JOBS", str(OLLAMA_NUM_PARALLEL * 4)))
+# Per-tenant weights, e.g. "10.0.0.5=3,10.0.0.6=0.5"; unlisted tenants weigh 1
+TENANT_WEIGHTS = parse_weights(os.getenv("TENANT_WEIGHTS"))
+# Seconds after which a waiting job is served oldest-first regardless of weight
+TENANT_AGE_SECONDS = float(os.getenv("TENANT_AGE_SECONDS", "30"))
+
+FETCH_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/125.0.0.0 Safari/537.36"
+    )
+}
+
+# Record progress on a PENDING document and notify event-stream subscribers (ARGV[2] is
+# the channel). An expired key is not recreated and a finished document keeps its 1.0.
+UPDATE_PROGRESS_LUA = """
+if redis.call('HGET', KEYS[1], 'status') ~= 'PENDING' then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'data_progress', ARGV[1])
+redis.call('PUBLISH', ARGV[2], cjson.encode({status = 'PENDING', data_progress = tonumber(ARGV[1])}))
+return 1
+"""
+
+# Move a document out of PENDING, store its result and notify event-stream subscribers
+# (ARGV[3] is the channel) in one atomic server-side step. Documents that already left
+# PENDING, or whose key expired, are left untouched.
+FINALIZE_DOCUMENT_LUA = """
+if redis.call('HGET', KEYS[1], 'status') ~= 'PENDING' then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'status', ARGV[1], 'summary', ARGV[2], 'data_progress', '1.0')
+redis.call('PUBLISH', ARGV[3], cjson.encode({status = ARGV[1], summary = ARGV[2], data_progress = 1.0}))
+return 1
+"""
+
+
+async def startup(ctx: Dict[str, Any]) -> None:
+    # arq's own ctx["redis"] returns bytes; document hashes are read/written as str
+    ctx["documents_redis"] = Redis.from_url(
+        REDIS_URL,
+        encoding="utf-8",
+        decode_responses=True,
+        socket_connect_timeout=2.0,
+        socket_timeout=2.0,
+    )
+    # Run via EVALSHA, loading the scripts on first use
+    ctx["update_progress"] = ctx["documents_redis"].register_script(UPDATE_PROGRESS_LUA)
+    ctx["finalize_document"] = ctx["documents_redis"].register_script(FINALIZE_DOCUMENT_LUA)
+    # Shares the Ollama slots fairly between submitters
+    ctx["scheduler"] = FairScheduler(
+        OLLAMA_NUM_PARALLEL, weights=TENANT_WEIGHTS, age_after=TENANT_AGE_SECONDS
+    )
+    # One keep-alive pool for page fetches across all jobs handled by this worker
+    ctx["fetch_client"] = httpx.AsyncClient(
+        timeout=20,
+        follow_redirects=True,
+        headers=FETCH_HEADERS,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        http2=True,
+    )
+    # Pay the model load before the first job instead of during it
+    try:
+        await warm_up_model()
+    except SummarizationError:
+        logger.warning("Ollama warm-up failed; the model will load on the first job")
+
+
+async def shutdown(ctx: Dict[str, Any]) -> None:
+    await ctx["fetch_client"].aclose()
+    await ctx["documents_redis"].aclose()
+    await aclose_summarizer()
+
+
+async def summarize(
+    ctx: Dict[str, Any], document_uuid: str, url: str, tenant: str = "anonymous"
+) -> None:
+    """Fetch the document URL, summarize it and store progress/result in its hash."""
+    await _process_document(ctx, document_uuid, url, tenant)
+
+
+async def _process_document(
+    ctx: Dict[str, Any], document_uuid: str, url: str, tenant: str
+) -> None:
+    redis: Redis = ctx["documents_redis"]
+    scheduler: FairScheduler = ctx["scheduler"]
+    client: httpx.AsyncClient = ctx["fetch_client"]
+    update_progress = ctx["update_progress"]
+    finalize = ctx["finalize_document"]
+    hash_key = f"document:{document_uuid}"
+    # Same channel as app.main.document_events_channel
+    channel = f"{hash_key}:events"
+
+    try:
+        fetch_resp = await client.get(url)
+        fetch_resp.raise_for_status()
+        content_text = fetch_resp.text
+        # 50% - content fetched, about to start summarization (one round-trip). Nothing
+        # left to do if the document expired or a previous run of this job finished it
+        if not await update_progress(keys=[hash_key], args=["0.5", channel]):
+            return
+
+        # Only model time is held against the tenant's fair share; the fetch above isn't
+        async with scheduler.slot(tenant):
+            summary_text = await summarize_with_gemma3(content_text, cache=redis)
+
+        # 100% - store the result and leave PENDING (one round-trip)
+        await finalize(keys=[hash_key], args=["SUCCESS", summary_text, channel])
+    except Exception:
+        await finalize(keys=[hash_key], args=["FAILED", "", channel])
+    except asyncio.CancelledError:
+        # job_timeout cancels the job without a retry; don't leave the document PENDING
+        # until its TTL runs out. Shielded so the write survives the cancellation
+        await asyncio.shield(finalize(keys=[hash_key], args=["FAILED", "", channel]))
+        raise
+
+
+class WorkerSettings:
+    functions = [summarize]
+    on_startup = startup
+    on_shutdown = shutdown
+    redis_settings = RedisSettings.from_dsn(REDIS_URL)
+    max_jobs = ARQ_MAX_JOBS
+    # Read no further ahead than we can run, so a job queued ahead of the rest (see
+    # FairJobQueue) is picked up on the next poll rather than after a stale batch of ids
+    queue_read_limit = ARQ_MAX_JOBS
+    # Includes time spent waiting for a fair-share slot
+    job_timeout = 1800
+
+
+if __name__ == "__main__":
+    # Same libuv-based loop the API runs on
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    run_worker(WorkerSettings)  # type: ignore[arg-type]
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+import contextlib
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import itertools
+from typing import Any, AsyncIterator, Deque, Dict, Mapping, Optional
+
+from arq.connections import ArqRedis
+from arq.constants import default_queue_name
+from arq.jobs import Job
+
+
+def parse_weights(raw: Optional[str]) -> Dict[str, float]:
+    """
+    Parse a tenant weight spec such as "10.0.0.5=3,10.0.0.6=0.5".
+
+    - Blank entries are ignored; malformed or non-positive weights raise ValueError
+    """
+    weights: Dict[str, float] = {}
+    for entry in (raw or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        tenant, sep, value = entry.rpartition("=")
+        if not sep or not tenant.strip():
+            raise ValueError(f"Invalid tenant weight entry: {entry!r}")
+        weight = float(value)
+        if weight <= 0:
+            raise ValueError(f"Tenant weight must be positive: {entry!r}")
+        weights[tenant.strip()] = weight
+    return weights
+
+
+# Give a job its weighted-fair virtual finish time, used as its ARQ queue score.
+# KEYS: ARQ queue, tenant's last finish, virtual clock (largest finish handed out)
+# ARGV: job cost (1000 / weight), tenant key TTL in seconds
+# Virtual now is the oldest queued score, or the clock once the queue has drained. Scores
+# count up from 1000, far below real millisecond timestamps, so every job is due at once
+# and ARQ just pulls them in this order.
+FAIR_SCORE_LUA = """
+local clock = tonumber(redis.call('GET', KEYS[3]) or '1000')
+local now = clock
+local head = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if head[2] then
+    now = math.min(clock, tonumber(head[2]))
+end
+local last = tonumber(redis.call('GET', KEYS[2]) or '0')
+local finish = math.max(now, last) + tonumber(ARGV[1])
+redis.call('SET', KEYS[2], finish, 'EX', ARGV[2])
+if finish > clock then
+    redis.call('SET', KEYS[3], finish)
+end
+return finish
+"""
+
+
+class FairJobQueue:
+    """
+    Enqueue ARQ jobs in weighted-fair order across tenants.
+
+    - ARQ serves its queue by score, normally the enqueue time. Each job here is scored
+      with its tenant's virtual finish time instead, so a tenant that enqueues a burst
+      only gets its share of the queue head and a newcomer's job goes in near the front
+    - Tenants' last finish times expire after tenant_ttl seconds of inactivity
+    """
+
+    def __init__(
+        self,
+        redis: ArqRedis,
+        *,
+        weights: Optional[Mapping[str, float]] = None,
+        default_weight: float = 1.0,
+        expires: float = 86400,
+        tenant_ttl: int = 86400,
+        queue_name: str = default_queue_name,
+    ) -> None:
+        self._redis = redis
+        self._weights = dict(weights or {})
+        self._default_weight = default_weight
+        self._expires = expires
+        self._tenant_ttl = tenant_ttl
+        self._queue_name = queue_name
+        self._score = redis.register_script(FAIR_SCORE_LUA)
+
+    async def enqueue_job(
+        self, function: str, *args: Any, _tenant: str, **kwargs: Any
+    ) -> Optional[Job]:
+        # Whole virtual ms, so the score survives ARQ's datetime round-trip exactly
+        cost = max(1, round(1000 / self._weights.get(_tenant, self._default_weight)))
+        score = await self._score(
+            keys=[self._queue_name, f"fair:tenant:{_tenant}", "fair:clock"],
+            args=[cost, self._tenant_ttl],
+        )
+        return await self._redis.enqueue_job(
+            function,
+            *args,
+            _queue_name=self._queue_name,
+            _defer_until=datetime.fromtimestamp(int(score) / 1000, tz=timezone.utc),
+            # ARQ derives the default expiry from the score, which is in the past here
+            _expires=self._expires,
+            **kwargs,
+        )
+
+    async def aclose(self) -> None:
+        await self._redis.aclose(close_connection_pool=True)
+
+
+@dataclass(eq=False)
+class _Waiter:
+    tenant: str
+    start: float
+    finish: float
+    enqueued_at: float
+    seq: int
+    future: asyncio.Future[None] = field(repr=False)
+
+
+class FairScheduler:
+    """
+    Weighted fair queueing of jobs across tenants over a fixed number of slots.
+
+    - Each job is tagged with a virtual finish time: max(virtual clock, tenant's last
+      finish) + 1 / weight. Free slots go to the waiting job with the smallest tag, so a
+      tenant submitting a burst can't starve the others
+    - Jobs that have waited longer than age_after seconds are served oldest-first
+      ahead of the tag order, so low-weight tenants still make progress
+    - Only orders jobs this worker has already pulled; FairJobQueue orders the queue itself
+    """
+
+    # Forgetting tenants is skipped until at least this many are tracked
+    _PRUNE_MIN = 1024
+
+    def __init__(
+        self,
+        slots: int,
+        *,
+        weights: Optional[Mapping[str, float]] = None,
+        default_weight: float = 1.0,
+        age_after: float = 30.0,
+    ) -> None:
+        self._slots = max(1, slots)
+        self._weights = dict(weights or {})
+        self._default_weight = default_weight
+        self._age_after = age_after
+        self._running = 0
+        self._vtime = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._waiting: Dict[str, Deque[_Waiter]] = {}
+        self._arrivals = itertools.count()
+        self._prune_at = self._PRUNE_MIN
+
+    @contextlib.asynccontextmanager
+    async def slot(self, tenant: str) -> AsyncIterator[None]:
+        await self.acquire(tenant)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, tenant: str) -> None:
+        loop = asyncio.get_running_loop()
+        start = max(self._vtime, self._last_finish.get(tenant, 0.0))
+        finish = start + 1.0 / self._weights.get(tenant, self._default_weight)
+        self._last_finish[tenant] = finish
+
+        if self._running < self._slots and not self._waiting:
+            self._running += 1
+            self._vtime = start
+            return
+
+        waiter = _Waiter(
+            tenant, start, finish, loop.time(), next(self._arrivals), loop.create_future()
+        )
+        self._waiting.setdefault(tenant, deque()).append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # The slot was handed over just as we were cancelled; pass it on
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+
+    def release(self) -> None:
+        self._running -= 1
+        self._dispatch()
+        if len(self._last_finish) > self._prune_at:
+            self._prune()
+
+    def _prune(self) -> None:
+        if self._waiting:
+            # A finish at or behind the virtual clock no longer affects the tenant's next tag
+            self._last_finish = {
+                tenant: finish
+                for tenant, finish in self._last_finish.items()
+                if finish > self._vtime
+            }
+        else:
+            # Nobody is queued to be fair to, so every tenant can start afresh
+            self._last_finish = {}
+        # Doubling keeps the sweeps amortized O(1) per job
+        self._prune_at = max(self._PRUNE_MIN, 2 * len(self._last_finish))
+
+    def _discard(self, waiter: _Waiter) -> None:
+        queue = self._waiting.get(waiter.tenant)
+        if queue is None:
+            return
+        with contextlib.suppress(ValueError):
+            queue.remove(waiter)
+        if not queue:
+            del self._waiting[waiter.tenant]
+
+    def _pick(self, now: float) -> _Waiter:
+        heads = [queue[0] for queue in self._waiting.values()]
+        aged = [waiter for waiter in heads if now - waiter.enqueued_at >= self._age_after]
+        if aged:
+            return min(aged, key=lambda waiter: waiter.seq)
+        # Equal tags go to whichever job arrived first
+        return min(heads, key=lambda waiter: (waiter.finish, waiter.seq))
+
+    def _dispatch(self) -> None:
+        now = asyncio.get_running_loop().time()
+        while self._running < self._slots and self._waiting:
+            waiter = self._pick(now)
+            queue = self._waiting[waiter.tenant]
+            queue.popleft()
+            if not queue:
+                del self._waiting[waiter.tenant]
+            if waiter.future.done():
+                continue  # cancelled while queued
+            self._running += 1
+            self._vtime = max(self._vtime, waiter.start)
+            waiter.future.set_result(None)
@@ -11,40 +11,69 @@ Usage:
 Prerequisites:
     1. Start Redis and Ollama services:
        docker-compose up redis ollama ollama-init
-    2. Start the API service:
-       docker-compose up api
+    2. Start the API and worker services:
+       docker-compose up api worker
     3. Run this script:
        python run_integration_tests.py
 """
 
-import subprocess
+import asyncio
 import sys
-import time
-import requests
 from pathlib import Path
 
+import httpx
+import pytest
 
-def check_service_health(service_name: str, url: str, max_retries: int = 30) -> bool:
-    """Check if a service is healthy and responding."""
+
+# Retry delays grow from PROBE_INITIAL_DELAY by PROBE_BACKOFF up to PROBE_MAX_DELAY, so fast
+# services are seen almost immediately and slow ones are polled at the old fixed rate
+PROBE_INITIAL_DELAY = 0.05
+PROBE_BACKOFF = 1.7
+PROBE_MAX_DELAY = 2.0
+
+
+async def check_service_health(
+    client: httpx.AsyncClient, service_name: str, url: str, max_wait: float = 60.0
+) -> bool:
+    """Check if a service is healthy and responding within max_wait seconds."""
     print(f"Checking {service_name} health at {url}...")
     
-    for i in range(max_retries):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_wait
+    delay = PROBE_INITIAL_DELAY
+    attempt = 0
+    while True:
+        attempt += 1
         try:
-            response = requests.get(url, timeout=5)
+            response = await client.get(url)
             if response.status_code == 200:
                 print(f"✓ {service_name} is healthy")
                 return True
-        except requests.exceptions.RequestException:
+        except httpx.HTTPError:
             pass
         
-        if i < max_retries - 1:
-            print(f"  Waiting for {service_name}... ({i+1}/{max_retries})")
-            time.sleep(2)
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        print(f"  Waiting for {service_name}... (attempt {attempt}, {remaining:.0f}s left)")
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * PROBE_BACKOFF, PROBE_MAX_DELAY)
     
-    print(f"✗ {service_name} is not responding after {max_retries} attempts")
+    print(f"✗ {service_name} is not responding after {max_wait:.0f} seconds")
     return False
 
 
+async def check_services_health() -> bool:
+    """Probe all services concurrently over one keep-alive client; True if all are healthy."""
+    limits = httpx.Limits(max_keepalive_connections=4)
+    async with httpx.AsyncClient(timeout=5.0, limits=limits) as client:
+        results = await asyncio.gather(
+            check_service_health(client, "API", "http://localhost:8000/health"),
+            check_service_health(client, "Ollama", "http://localhost:11434/api/tags"),
+        )
+    return all(results)
+
+
 def main():
     """Run the integration tests."""
     print("🚀 LLM Summariser Service - Integration Test Runner")
@@ -59,20 +88,13 @@ def main():
     # Check service health
     print("\n📋 Checking service health...")
     
-    services_healthy = True
-    
-    # Check API health
-    if not check_service_health("API", "http://localhost:8000/health"):
-        services_healthy = False
-    
-    # Check Ollama health
-    if not check_service_health("Ollama", "http://localhost:11434/api/tags"):
-        services_healthy = False
+    # API and Ollama are probed at the same time, so the wait is the slower of the two
+    services_healthy = asyncio.run(check_services_health())
     
     if not services_healthy:
         print("\n❌ Some services are not healthy. Please check:")
         print("   1. Start Redis and Ollama: docker-compose up redis ollama ollama-init")
-        print("   2. Start the API: docker-compose up api")
+        print("   2. Start the API and worker: docker-compose up api worker")
         print("   3. Wait for all services to be ready")
         sys.exit(1)
     
@@ -83,18 +105,18 @@ def main():
     print("-" * 40)
     
     try:
-        # Run pytest with verbose output
-        result = subprocess.run([
-            sys.executable, "-m", "pytest", 
+        # Run pytest in this interpreter with verbose output; the cwd check above
+        # already guarantees the path resolves
+        returncode = pytest.main([
             "tests/test_integration_concurrency.py",
             "-v", "-s", "--tb=short"
-        ], cwd=Path.cwd())
+        ])
         
-        if result.returncode == 0:
+        if returncode == 0:
             print("\n✅ All integration tests passed!")
         else:
             print("\n❌ Some integration tests failed!")
-            sys.exit(result.returncode)
+            sys.exit(int(returncode))
             
     except KeyboardInterrupt:
         print("\n⏹️  Tests interrupted by user")
@@ -1,5 +1,15 @@
+import asyncio
 import sys
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pytest
+from fastapi.testclient import TestClient
+
+try:
+    import uvloop
+except ImportError:  # uvloop doesn't support Windows
+    uvloop = None
 
 
 # Ensure project package root (fastAPI-backend) is on sys.path so `import app` works
@@ -7,3 +17,139 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
+from app.main import app, get_job_queue, get_redis, get_stream_redis  # noqa: E402
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.last_hset_args: Optional[Dict[str, Any]] = None
+        self.hashes: Dict[str, Dict[str, Any]] = {}
+        self.ttls: Dict[str, int] = {}
+        self.channels: Dict[str, List[Any]] = {}
+        self.pubsubs: List["FakePubSub"] = []
+
+    async def hset(self, key: str, mapping: Dict[str, Any]) -> int:
+        self.last_hset_args = {"key": key, "mapping": mapping}
+        self.hashes[key] = mapping  # callers build a fresh mapping per call
+        return 1
+
+    async def hgetall(self, key: str) -> Dict[str, Any]:
+        return self.hashes.get(key, {})
+
+    async def hmget(self, key: str, *fields: str) -> List[Optional[Any]]:
+        stored = self.hashes.get(key, {})
+        return [stored.get(field) for field in fields]
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        self.ttls[key] = seconds
+        return key in self.hashes
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+    async def publish(self, channel: str, message: Any) -> int:
+        self.channels.setdefault(channel, []).append(message)
+        return 1
+
+    def pubsub(self) -> "FakePubSub":
+        pubsub = FakePubSub(self)
+        self.pubsubs.append(pubsub)
+        return pubsub
+
+    async def aclose(self) -> None:
+        return None
+
+
+class FakePipeline:
+    def __init__(self, redis: FakeRedis) -> None:
+        self.redis = redis
+        self.commands: List[Tuple[str, Tuple[Any, ...], Dict[str, Any]]] = []
+
+    async def __aenter__(self) -> "FakePipeline":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.commands.clear()
+
+    def hset(self, key: str, mapping: Dict[str, Any]) -> "FakePipeline":
+        self.commands.append(("hset", (key,), {"mapping": mapping}))
+        return self
+
+    def expire(self, key: str, seconds: int) -> "FakePipeline":
+        self.commands.append(("expire", (key, seconds), {}))
+        return self
+
+    async def execute(self) -> List[Any]:
+        results = []
+        for name, args, kwargs in self.commands:
+            results.append(await getattr(self.redis, name)(*args, **kwargs))
+        self.commands.clear()
+        return results
+
+
+class FakePubSub:
+    # Replays whatever was published to the subscribed channels, then reports no messages
+    def __init__(self, redis: FakeRedis) -> None:
+        self.redis = redis
+        self.subscribed: List[str] = []
+        self.closed = False
+
+    async def subscribe(self, *channels: str) -> None:
+        self.subscribed.extend(channels)
+
+    async def get_message(
+        self, ignore_subscribe_messages: bool = False, timeout: Optional[float] = 0.0
+    ) -> Optional[Dict[str, Any]]:
+        for channel in self.subscribed:
+            pending = self.redis.channels.get(channel)
+            if pending:
+                return {"type": "message", "channel": channel, "data": pending.pop(0)}
+        return None
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+class FakeJobQueue:
+    def __init__(self) -> None:
+        self.jobs: List[Tuple[str, Tuple[Any, ...]]] = []
+
+    async def enqueue_job(self, function: str, *args: Any, **kwargs: Any) -> None:
+        self.jobs.append((function, args))
+        return None
+
+
+@pytest.fixture(scope="session")
+def event_loop_policy() -> asyncio.AbstractEventLoopPolicy:
+    # Async tests run on the same libuv-based loop as the API and worker
+    if uvloop is not None:
+        return uvloop.EventLoopPolicy()
+    return asyncio.DefaultEventLoopPolicy()
+
+
+@pytest.fixture()
+def job_queue() -> FakeJobQueue:
+    return FakeJobQueue()
+
+
+@pytest.fixture(scope="session")
+def _test_client() -> Iterator[TestClient]:
+    # One lifespan startup/shutdown for the whole session; per-test state lives in overrides
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture()
+def client(_test_client: TestClient, job_queue: FakeJobQueue) -> Iterator[Tuple[TestClient, FakeRedis]]:
+    fake = FakeRedis()
+
+    async def override_get_redis():
+        yield fake
+
+    app.dependency_overrides[get_redis] = override_get_redis
+    app.dependency_overrides[get_stream_redis] = lambda: fake
+    app.dependency_overrides[get_job_queue] = lambda: job_queue
+    yield _test_client, fake
+    app.dependency_overrides.pop(get_redis, None)
+    app.dependency_overrides.pop(get_stream_redis, None)
+    app.dependency_overrides.pop(get_job_queue, None)
@@ -1,42 +1,10 @@
-from typing import Any, Dict, Optional
 import uuid
-import pytest
-from fastapi.testclient import TestClient
+import orjson
 
-from app.main import app, get_redis
+from app.main import DOCUMENT_TTL_SECONDS, document_events_channel
 
 
-class FakeRedis:
-    def __init__(self) -> None:
-        self.last_hset_args: Optional[Dict[str, Any]] = None
-        self.hashes: Dict[str, Dict[str, Any]] = {}
-
-    async def hset(self, key: str, mapping: Dict[str, Any]) -> int:
-        self.last_hset_args = {"key": key, "mapping": mapping}
-        self.hashes[key] = dict(mapping)
-        return 1
-
-    async def hgetall(self, key: str) -> Dict[str, Any]:
-        return dict(self.hashes.get(key, {}))
-
-    async def aclose(self) -> None:
-        return None
-
-
-@pytest.fixture()
-def client():
-    fake = FakeRedis()
-
-    async def override_get_redis():
-        yield fake
-
-    app.dependency_overrides[get_redis] = override_get_redis
-    with TestClient(app) as c:
-        yield c, fake
-    app.dependency_overrides.pop(get_redis, None)
-
-
-def test_create_document_success(client):
+def test_create_document_success(client, job_queue):
     c, fake = client
     payload = {"name": "Example Doc", "URL": "https://example.com"}
 
@@ -64,7 +32,12 @@ def test_create_document_success(client):
     assert stored["name"] == payload["name"]
     assert stored["URL"] == expected_url
     assert stored["summary"] == ""
-    
+    # ensure the record was given a TTL
+    assert fake.ttls[fake.last_hset_args["key"]] == DOCUMENT_TTL_SECONDS
+    # ensure the summarization job was handed to the worker queue
+    assert job_queue.jobs == [("summarize", (data["document_uuid"], expected_url, "testclient"))]
+
+
 def test_create_document_validation_error(client):
     c, _ = client
     # invalid URL
@@ -102,3 +75,100 @@ def test_get_document_not_found(client):
     assert resp.status_code == 404
     assert resp.json()["detail"] == "Document not found"
 
+
+def test_get_document_corrupt_record(client):
+    c, fake = client
+    fake.hashes["document:broken"] = {"status": "PENDING", "summary": ""}
+
+    resp = c.get("/documents/broken/")
+    assert resp.status_code == 500
+    assert resp.json()["detail"] == "Corrupt document record"
+
+
+def test_stream_document_sends_updates_until_finished(client):
+    c, fake = client
+    created = c.post("/documents/", json={"name": "Doc", "URL": "https://example.org"}).json()
+    doc_uuid = created["document_uuid"]
+    channel = document_events_channel(doc_uuid)
+    fake.channels[channel] = [
+        orjson.dumps({"status": "PENDING", "data_progress": 0.5}).decode(),
+        orjson.dumps({"status": "SUCCESS", "summary": "Done.", "data_progress": 1.0}).decode(),
+    ]
+
+    with c.stream("GET", f"/documents/{doc_uuid}/stream") as resp:
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/event-stream")
+        events = [
+            orjson.loads(line[len("data: "):]) for line in resp.iter_lines() if line.startswith("data: ")
+        ]
+
+    assert [(e["status"], e["data_progress"], e["summary"]) for e in events] == [
+        ("PENDING", 0.0, None),
+        ("PENDING", 0.5, None),
+        ("SUCCESS", 1.0, "Done."),
+    ]
+    assert all(e["document_uuid"] == doc_uuid and e["name"] == "Doc" for e in events)
+    assert fake.pubsubs[-1].subscribed == [channel]
+    assert fake.pubsubs[-1].closed
+
+
+def test_stream_document_ends_when_record_expires(client, monkeypatch):
+    c, fake = client
+    created = c.post("/documents/", json={"name": "Doc", "URL": "https://example.org"}).json()
+    doc_uuid = created["document_uuid"]
+    fake.channels[document_events_channel(doc_uuid)] = [
+        orjson.dumps({"status": "PENDING", "data_progress": 0.5}).decode(),
+    ]
+    hmget = fake.hmget
+    loads = []
+
+    async def expire_after_snapshot(key, *fields):
+        # The key expires (and nothing more is published) once the stream has its snapshot
+        if loads:
+            fake.hashes.pop(key, None)
+        loads.append(key)
+        return await hmget(key, *fields)
+
+    monkeypatch.setattr(fake, "hmget", expire_after_snapshot)
+
+    with c.stream("GET", f"/documents/{doc_uuid}/stream") as resp:
+        assert resp.status_code == 200
+        events = [
+            orjson.loads(line[len("data: "):]) for line in resp.iter_lines() if line.startswith("data: ")
+        ]
+
+    assert [(e["status"], e["data_progress"]) for e in events] == [("PENDING", 0.0), ("PENDING", 0.5)]
+    assert fake.pubsubs[-1].closed
+
+
+def test_stream_document_picks_up_unpublished_result(client, monkeypatch):
+    c, fake = client
+    created = c.post("/documents/", json={"name": "Doc", "URL": "https://example.org"}).json()
+    doc_uuid = created["document_uuid"]
+    hmget = fake.hmget
+    loads = []
+
+    async def fail_after_snapshot(key, *fields):
+        # The job fails once the stream has its snapshot, without its event reaching it
+        if loads:
+            fake.hashes[key] = {**fake.hashes[key], "status": "FAILED", "data_progress": "1.0"}
+        loads.append(key)
+        return await hmget(key, *fields)
+
+    monkeypatch.setattr(fake, "hmget", fail_after_snapshot)
+
+    with c.stream("GET", f"/documents/{doc_uuid}/stream") as resp:
+        events = [
+            orjson.loads(line[len("data: "):]) for line in resp.iter_lines() if line.startswith("data: ")
+        ]
+
+    assert [(e["status"], e["data_progress"]) for e in events] == [("PENDING", 0.0), ("FAILED", 1.0)]
+    assert fake.pubsubs[-1].closed
+
+
+def test_stream_document_not_found(client):
+    c, fake = client
+    resp = c.get("/documents/00000000-0000-0000-0000-000000000000/stream")
+    assert resp.status_code == 404
+    assert resp.json()["detail"] == "Document not found"
+    assert fake.pubsubs[-1].closed
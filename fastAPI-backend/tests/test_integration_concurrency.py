@@ -59,7 +59,11 @@ class DocumentSummarizerClient:
     
     def __init__(self, base_url: str = IntegrationTestConfig.API_BASE_URL):
         self.base_url = base_url
-        self.client = httpx.AsyncClient(timeout=30.0)
+        # Enough pooled keep-alive connections that no fan-out step queues for one
+        self.client = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+        )
     
     async def close(self):
         """Close the HTTP client."""
@@ -216,60 +220,78 @@ async def test_sequential_integration_workflow():
         print("ℹ️  Make sure the background task runner is running: python -m background_tasks.runner")
         
         max_wait_time = 600  # 10 minutes
-        check_interval = 10  # 10 seconds (increased to reduce noise)
+        # Back off from 50ms up to 10s between checks so quick completions are seen promptly
+        check_interval = 10
+        check_delay = 0.05
+        # Give up early if no document has moved at all after this long: no runner is working
+        runner_grace_time = 30
+        progress_seen = False
         start_time = time.time()
         
         all_completed = False
-        final_results = []
+        # Only documents still PENDING are re-fetched; finished ones keep their last result
+        document_ids = [doc["document_uuid"] for doc in successful_retrievals]
+        pending_ids = set(document_ids)
+        final_by_id: Dict[str, Any] = {}
         
         while time.time() - start_time < max_wait_time:
-            # Check all documents
-            tasks = []
-            for doc in successful_retrievals:
-                task = client.get_document(doc["document_uuid"])
-                tasks.append(task)
-            
+            # Check the documents that haven't finished yet
+            polled_ids = list(pending_ids)
+            tasks = [client.get_document(document_id) for document_id in polled_ids]
             results = await asyncio.gather(*tasks, return_exceptions=True)
             
+            for document_id, result in zip(polled_ids, results):
+                # Errors count as finished, as before; there is nothing more to wait for
+                if isinstance(result, Exception):
+                    finished = True
+                else:
+                    finished = result["status"] != "PENDING"
+                    progress_seen = progress_seen or finished or result["data_progress"] > 0.0
+                if finished:
+                    final_by_id[document_id] = result
+                    pending_ids.discard(document_id)
+            
             # Count statuses
-            pending_count = 0
+            pending_count = len(pending_ids)
             success_count = 0
             failed_count = 0
             
-            for result in results:
+            for result in final_by_id.values():
                 if isinstance(result, Exception):
                     failed_count += 1
-                else:
-                    status = result["status"]
-                    if status == "PENDING":
-                        pending_count += 1
-                    elif status == "SUCCESS":
-                        success_count += 1
-                    elif status == "FAILED":
-                        failed_count += 1
+                elif result["status"] == "SUCCESS":
+                    success_count += 1
+                elif result["status"] == "FAILED":
+                    failed_count += 1
             
             elapsed = int(time.time() - start_time)
             print(f"Status check ({elapsed}s): {pending_count} PENDING, {success_count} SUCCESS, {failed_count} FAILED")
             
-            if pending_count == 0:
+            if not pending_ids:
                 all_completed = True
-                final_results = results
                 break
             
-            await asyncio.sleep(check_interval)
+            if not progress_seen and elapsed >= runner_grace_time:
+                print(f"ℹ️  No document progressed within {runner_grace_time} seconds - background task runner may not be running")
+                break
+            
+            await asyncio.sleep(check_delay)
+            check_delay = min(check_delay * 1.7, check_interval)
         
         # For integration tests, we'll be more lenient about completion
         if not all_completed:
-            print(f"⚠️  Not all documents completed within {max_wait_time} seconds")
+            if progress_seen:
+                print(f"⚠️  Not all documents completed within {max_wait_time} seconds")
             print("ℹ️  This is expected if the background task runner is not running")
             print("ℹ️  The test will continue to verify what was processed")
             
-            # Get final status for all documents
-            tasks = []
-            for doc in successful_retrievals:
-                task = client.get_document(doc["document_uuid"])
-                tasks.append(task)
-            final_results = await asyncio.gather(*tasks, return_exceptions=True)
+            # Get final status for the documents still pending
+            polled_ids = list(pending_ids)
+            tasks = [client.get_document(document_id) for document_id in polled_ids]
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            final_by_id.update(zip(polled_ids, results))
+        
+        final_results = [final_by_id[document_id] for document_id in document_ids]
         
         # Verify summaries for completed documents
         successful_summaries = 0
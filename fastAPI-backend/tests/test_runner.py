@@ -0,0 +1,174 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List
+
+import fakeredis
+import httpx
+import orjson
+import pytest
+
+from background_tasks import runner
+from background_tasks.runner import (
+    FINALIZE_DOCUMENT_LUA,
+    UPDATE_PROGRESS_LUA,
+    _process_document,
+)
+from background_tasks.scheduling import FairScheduler
+
+DOCUMENT_UUID = "0b8e5b4e-6b5f-4a3e-9c7e-1d2f3a4b5c6d"
+HASH_KEY = f"document:{DOCUMENT_UUID}"
+CHANNEL = f"{HASH_KEY}:events"
+
+
+def _fetch_client(status_code: int) -> httpx.AsyncClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(status_code, text="<p>Some article text.</p>")
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture()
+async def ctx() -> AsyncIterator[Dict[str, Any]]:
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    await redis.hset(HASH_KEY, mapping={"status": "PENDING", "data_progress": "0.0"})
+    ctx: Dict[str, Any] = {
+        "documents_redis": redis,
+        "update_progress": redis.register_script(UPDATE_PROGRESS_LUA),
+        "finalize_document": redis.register_script(FINALIZE_DOCUMENT_LUA),
+        "scheduler": FairScheduler(1),
+        "fetch_client": _fetch_client(200),
+    }
+    yield ctx
+    await ctx["fetch_client"].aclose()
+    await redis.aclose()
+
+
+async def _collect_events(ctx: Dict[str, Any], run: Any) -> List[Dict[str, Any]]:
+    pubsub = ctx["documents_redis"].pubsub()
+    await pubsub.subscribe(CHANNEL)
+    await pubsub.get_message(timeout=1)  # subscribe confirmation
+    await run
+    events: List[Dict[str, Any]] = []
+    while (message := await pubsub.get_message(timeout=0.1)) is not None:
+        events.append(orjson.loads(message["data"]))
+    await pubsub.aclose()
+    return events
+
+
+async def test_process_document_stores_summary(
+    ctx: Dict[str, Any], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def fake_summarize(text: str, cache: Any = None) -> str:
+        return "A short summary."
+
+    monkeypatch.setattr(runner, "summarize_with_gemma3", fake_summarize)
+
+    events = await _collect_events(
+        ctx, _process_document(ctx, DOCUMENT_UUID, "https://example.com/", "tenant")
+    )
+
+    assert await ctx["documents_redis"].hgetall(HASH_KEY) == {
+        "status": "SUCCESS",
+        "summary": "A short summary.",
+        "data_progress": "1.0",
+    }
+    assert events == [
+        {"status": "PENDING", "data_progress": 0.5},
+        {"status": "SUCCESS", "summary": "A short summary.", "data_progress": 1.0},
+    ]
+
+
+async def test_process_document_marks_failed_fetch(ctx: Dict[str, Any]) -> None:
+    await ctx["fetch_client"].aclose()
+    ctx["fetch_client"] = _fetch_client(404)
+
+    events = await _collect_events(
+        ctx, _process_document(ctx, DOCUMENT_UUID, "https://example.com/", "tenant")
+    )
+
+    assert await ctx["documents_redis"].hgetall(HASH_KEY) == {
+        "status": "FAILED",
+        "summary": "",
+        "data_progress": "1.0",
+    }
+    assert events == [{"status": "FAILED", "summary": "", "data_progress": 1.0}]
+
+
+async def test_finalize_document_runs_once(ctx: Dict[str, Any]) -> None:
+    finalize = ctx["finalize_document"]
+
+    assert await finalize(keys=[HASH_KEY], args=["SUCCESS", "first", CHANNEL]) == 1
+    events = await _collect_events(
+        ctx, finalize(keys=[HASH_KEY], args=["FAILED", "", CHANNEL])
+    )
+
+    # The document already left PENDING: nothing is overwritten or published
+    assert await ctx["documents_redis"].hget(HASH_KEY, "status") == "SUCCESS"
+    assert await ctx["documents_redis"].hget(HASH_KEY, "summary") == "first"
+    assert events == []
+
+
+async def test_finalize_document_skips_expired_key(ctx: Dict[str, Any]) -> None:
+    redis = ctx["documents_redis"]
+    await redis.delete(HASH_KEY)
+
+    result = await ctx["finalize_document"](keys=[HASH_KEY], args=["SUCCESS", "late", CHANNEL])
+
+    assert result == 0
+    assert await redis.exists(HASH_KEY) == 0
+
+
+async def test_process_document_marks_cancelled_job_failed(
+    ctx: Dict[str, Any], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    started = asyncio.Event()
+
+    async def hanging_summarize(text: str, cache: Any = None) -> str:
+        started.set()
+        await asyncio.Event().wait()
+        return ""
+
+    monkeypatch.setattr(runner, "summarize_with_gemma3", hanging_summarize)
+
+    # What arq's job_timeout does to a job that runs too long
+    job = asyncio.create_task(
+        _process_document(ctx, DOCUMENT_UUID, "https://example.com/", "tenant")
+    )
+    await started.wait()
+    job.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await job
+
+    assert await ctx["documents_redis"].hgetall(HASH_KEY) == {
+        "status": "FAILED",
+        "summary": "",
+        "data_progress": "1.0",
+    }
+
+
+@pytest.mark.parametrize(
+    "record",
+    [
+        {},
+        {"status": "SUCCESS", "summary": "Done earlier.", "data_progress": "1.0"},
+    ],
+    ids=["expired", "finished"],
+)
+async def test_process_document_leaves_non_pending_records_alone(
+    ctx: Dict[str, Any], monkeypatch: pytest.MonkeyPatch, record: Dict[str, str]
+) -> None:
+    async def unexpected_summarize(text: str, cache: Any = None) -> str:
+        raise AssertionError("summarized a document that is no longer PENDING")
+
+    monkeypatch.setattr(runner, "summarize_with_gemma3", unexpected_summarize)
+    redis = ctx["documents_redis"]
+    await redis.delete(HASH_KEY)
+    if record:
+        await redis.hset(HASH_KEY, mapping=record)
+
+    events = await _collect_events(
+        ctx, _process_document(ctx, DOCUMENT_UUID, "https://example.com/", "tenant")
+    )
+
+    # An expired key is not recreated without its TTL and a finished one keeps its result
+    assert await redis.hgetall(HASH_KEY) == record
+    assert events == []
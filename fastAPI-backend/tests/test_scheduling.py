@@ -0,0 +1,123 @@
+import asyncio
+from typing import AsyncIterator, List
+
+import fakeredis
+import pytest
+from arq.connections import ArqRedis
+from arq.utils import timestamp_ms
+
+from background_tasks.scheduling import FairJobQueue, FairScheduler, parse_weights
+
+
+@pytest.fixture()
+async def arq_redis() -> AsyncIterator[ArqRedis]:
+    redis = ArqRedis(connection_pool=fakeredis.FakeAsyncRedis().connection_pool)
+    yield redis
+    await redis.aclose(close_connection_pool=True)
+
+
+async def _queued_args(redis: ArqRedis) -> List[str]:
+    order: List[str] = []
+    for job_id in await redis.zrange("arq:queue", 0, -1):
+        info = await redis._get_job_def(job_id, None)
+        order.append(info.args[0])
+    return order
+
+
+async def _run_jobs(scheduler: FairScheduler, tenants: List[str]) -> List[str]:
+    order: List[str] = []
+    release = asyncio.Event()
+
+    async def job(tenant: str, block: bool) -> None:
+        async with scheduler.slot(tenant):
+            order.append(tenant)
+            if block:
+                await release.wait()
+            await asyncio.sleep(0)
+
+    # The first job holds the only slot until every other job is queued
+    first = asyncio.create_task(job(tenants[0], block=True))
+    await asyncio.sleep(0)
+    rest = [asyncio.create_task(job(t, block=False)) for t in tenants[1:]]
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(first, *rest)
+    return order
+
+
+async def test_fair_scheduler_interleaves_a_burst_with_other_tenants() -> None:
+    scheduler = FairScheduler(1, age_after=60)
+
+    order = await _run_jobs(scheduler, ["a", "a", "a", "a", "b"])
+
+    # b arrived last but is served right after a's first job, not after the whole burst
+    assert order == ["a", "b", "a", "a", "a"]
+
+
+async def test_fair_scheduler_shares_slots_by_weight() -> None:
+    scheduler = FairScheduler(1, weights={"heavy": 2.0}, age_after=60)
+
+    order = await _run_jobs(scheduler, ["other"] + ["heavy"] * 4 + ["light"] * 2)
+
+    # heavy gets two turns for every one of light's
+    assert order == ["other", "heavy", "heavy", "light", "heavy", "heavy", "light"]
+
+
+async def test_fair_scheduler_serves_aged_jobs_oldest_first() -> None:
+    scheduler = FairScheduler(1, age_after=0)
+
+    order = await _run_jobs(scheduler, ["a", "a", "a", "b"])
+
+    assert order == ["a", "a", "a", "b"]
+
+
+async def test_fair_scheduler_forgets_tenants_behind_the_clock() -> None:
+    scheduler = FairScheduler(1, age_after=60)
+    scheduler._prune_at = 4  # type: ignore[attr-defined]
+
+    for i in range(10):
+        async with scheduler.slot(f"tenant-{i}"):
+            pass
+
+    assert len(scheduler._last_finish) <= 5
+    # Scheduling carries on as before
+    assert await _run_jobs(scheduler, ["a", "a", "a", "b"]) == ["a", "b", "a", "a"]
+
+
+async def test_fair_job_queue_puts_a_newcomer_ahead_of_a_burst(arq_redis: ArqRedis) -> None:
+    jobs = FairJobQueue(arq_redis, expires=60)
+
+    for i in range(10):
+        await jobs.enqueue_job("summarize", f"a{i}", _tenant="a")
+    await jobs.enqueue_job("summarize", "b0", _tenant="b")
+
+    order = await _queued_args(arq_redis)
+    # b's job ties with a's second, behind only a's first, instead of after the whole burst
+    assert order.index("b0") <= 2
+    # Every job is due immediately and keeps the requested expiry
+    scores = [score for _, score in await arq_redis.zrange("arq:queue", 0, -1, withscores=True)]
+    assert 0 < max(scores) < timestamp_ms()
+    assert 0 < await arq_redis.pttl(b"arq:job:" + (await arq_redis.zrange("arq:queue", 0, 0))[0]) <= 60_000
+
+
+async def test_fair_job_queue_orders_by_weight(arq_redis: ArqRedis) -> None:
+    jobs = FairJobQueue(arq_redis, weights={"heavy": 2.5}, expires=60)
+
+    for i in range(3):
+        await jobs.enqueue_job("summarize", f"light{i}", _tenant="light")
+    for i in range(4):
+        await jobs.enqueue_job("summarize", f"heavy{i}", _tenant="heavy")
+
+    # heavy arrives after light's burst but is queued at 2.5 jobs per light job
+    assert await _queued_args(arq_redis) == [
+        "light0", "heavy0", "heavy1", "light1", "heavy2", "heavy3", "light2"
+    ]
+
+
+def test_parse_weights() -> None:
+    assert parse_weights(" 10.0.0.5=3, 10.0.0.6=0.5 ,") == {"10.0.0.5": 3.0, "10.0.0.6": 0.5}
+    assert parse_weights(None) == {}
+    with pytest.raises(ValueError):
+        parse_weights("10.0.0.5")
+    with pytest.raises(ValueError):
+        parse_weights("10.0.0.5=0")
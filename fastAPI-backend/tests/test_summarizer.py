@@ -1,5 +1,7 @@
+import asyncio
 from typing import Any, Dict
 
+import httpx
 import pytest
 
 import background_tasks.summarizer as summarizer
@@ -22,18 +24,21 @@ def test_extract_readable_text_strips_scripts_and_styles() -> None:
     assert "More text" in text
 
 
-def test_summarize_with_gemma3_calls_ollama_with_cleaned_text(monkeypatch: pytest.MonkeyPatch) -> None:
+async def test_summarize_with_gemma3_calls_ollama_with_cleaned_text(monkeypatch: pytest.MonkeyPatch) -> None:
     captured: Dict[str, Any] = {}
 
-    def fake_generate(*, model: str, prompt: str, options: Dict[str, Any]) -> Dict[str, str]:  # type: ignore[override]
-        captured["model"] = model
-        captured["prompt"] = prompt
-        assert "<script>" not in prompt
-        assert "var a=1" not in prompt
-        assert "Title & Intro" in prompt
-        return {"response": "Title & Intro is discussed. Content is summarized in prose, not bullets."}
+    async def fake_send(_client: Any, request: Any) -> str:
+        _host, payload = request
+        captured["model"] = payload["model"]
+        captured["prompt"] = payload["prompt"]
+        captured["stream"] = payload["stream"]
+        assert "<script>" not in payload["prompt"]
+        assert "var a=1" not in payload["prompt"]
+        assert "Title & Intro" in payload["prompt"]
+        return "Title & Intro is discussed. Content is summarized in prose, not bullets."
 
-    monkeypatch.setattr(summarizer.ollama, "generate", fake_generate)  # type: ignore[arg-type]
+    batcher = summarizer._GenerateBatcher(fake_send, max_wait_ms=0)  # type: ignore[attr-defined]
+    monkeypatch.setattr(summarizer, "_batcher", batcher)
     # Ensure cleaner returns enough tokens to avoid early return
     monkeypatch.setattr(
         summarizer,
@@ -43,18 +48,33 @@ def test_summarize_with_gemma3_calls_ollama_with_cleaned_text(monkeypatch: pytes
 
     # Raw HTML can be short; cleaner is mocked to expand it
     html = "<h1>Title &amp; Intro</h1><script>var a=1</script><p>Content</p>"
-    out = summarizer.summarize_with_gemma3(html, max_chars=1000, model="gemma3:1b")
+    try:
+        out = await summarizer.summarize_with_gemma3(html, max_chars=1000, model="gemma3:1b")
+    finally:
+        await batcher.aclose()
 
     assert out.endswith(".")
-    # If the model was invoked, validate call details; otherwise we still validated cleaning and output shape
-    if captured:
-        assert captured.get("model") == "gemma3:1b"
-        assert "Task: Write a clear multi-paragraph summary" in captured["prompt"]
+    assert captured.get("model") == "gemma3:1b"
+    assert captured.get("stream") is False
+    assert "Task: Write a clear multi-paragraph summary" in captured["prompt"]
 
 
-def test_summarize_with_gemma3_empty_input_raises() -> None:
+async def test_post_generate_reads_single_non_streaming_response() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/api/generate"
+        return httpx.Response(200, json={"model": "gemma3:1b", "response": "A summary.", "done": True})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        out = await summarizer._post_generate(  # type: ignore[attr-defined]
+            client, ("http://ollama", {"model": "gemma3:1b", "prompt": "p", "stream": False})
+        )
+
+    assert out == "A summary."
+
+
+async def test_summarize_with_gemma3_empty_input_raises() -> None:
     with pytest.raises(summarizer.SummarizationError):
-        summarizer.summarize_with_gemma3("")
+        await summarizer.summarize_with_gemma3("")
 
 
 def test_finalize_summary_snaps_to_sentence_end() -> None:
@@ -71,3 +91,270 @@ def test_finalize_summary_respects_word_cap() -> None:
     assert len(finalized.split()) <= 1500
 
 
+async def test_generate_batcher_caps_in_flight_requests_without_waiting_on_slow_batches() -> None:
+    in_flight = 0
+    peak = 0
+    finished: list[str] = []
+
+    async def fake_send(_client: Any, request: Any) -> str:
+        nonlocal in_flight, peak
+        prompt = request[1]["prompt"]
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.2 if prompt == "p0" else 0.01)
+        in_flight -= 1
+        finished.append(prompt)
+        return f"summary for {prompt}"
+
+    batcher = summarizer._GenerateBatcher(fake_send, max_batch=3, max_wait_ms=20)  # type: ignore[attr-defined]
+    prompts = [f"p{i}" for i in range(5)]
+
+    try:
+        results = await asyncio.gather(
+            *(batcher.generate(("http://ollama", {"prompt": p})) for p in prompts)
+        )
+    finally:
+        await batcher.aclose()
+
+    assert results == [f"summary for {p}" for p in prompts]
+    assert peak == 3
+    # p3 and p4 take the slots p1 and p2 free up instead of waiting for p0's batch
+    assert finished[-1] == "p0"
+
+
+async def test_generate_batcher_keeps_short_and_long_prompts_in_separate_batches() -> None:
+    async def fake_send(_client: Any, request: Any) -> str:
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    batcher = summarizer._GenerateBatcher(  # type: ignore[attr-defined]
+        fake_send, max_batch=4, max_wait_ms=20, thresholds=(100,)
+    )
+    batches: list[set[int]] = []
+    take_batch = batcher._take_batch
+
+    def recording_take_batch(now: float) -> Any:
+        batch = take_batch(now)
+        if batch:
+            batches.append({len(request[1]["prompt"]) for request, _future, _at in batch})
+        return batch
+
+    batcher._take_batch = recording_take_batch
+    prompts = ["s" * 10, "l" * 500, "s" * 10, "l" * 500]
+
+    try:
+        await asyncio.gather(
+            *(batcher.generate(("http://ollama", {"prompt": p}), size=len(p)) for p in prompts)
+        )
+    finally:
+        await batcher.aclose()
+
+    assert sorted(batches, key=min) == [{10}, {500}]
+
+
+async def test_generate_batcher_short_prompts_finish_while_long_batch_runs() -> None:
+    finished: list[str] = []
+
+    async def fake_send(_client: Any, request: Any) -> str:
+        prompt = request[1]["prompt"]
+        await asyncio.sleep(0.5 if prompt.startswith("l") else 0.05)
+        finished.append(prompt)
+        return "ok"
+
+    batcher = summarizer._GenerateBatcher(  # type: ignore[attr-defined]
+        fake_send, max_batch=4, max_wait_ms=10, thresholds=(100,)
+    )
+
+    async def generate(prompt: str) -> str:
+        return await batcher.generate(("http://ollama", {"prompt": prompt}), size=len(prompt))
+
+    long_prompt = "l" * 500
+    try:
+        long_job = asyncio.ensure_future(generate(long_prompt))
+        await asyncio.sleep(0.05)  # the long request is in flight by now
+        await asyncio.gather(generate("s1"), generate("s2"))
+        assert not long_job.done()
+        await long_job
+    finally:
+        await batcher.aclose()
+
+    assert finished == ["s1", "s2", long_prompt] or finished == ["s2", "s1", long_prompt]
+
+
+async def test_generate_batcher_drops_requests_of_cancelled_callers() -> None:
+    sent: list[str] = []
+    cancelled: list[str] = []
+
+    async def fake_send(_client: Any, request: Any) -> str:
+        prompt = request[1]["prompt"]
+        sent.append(prompt)
+        try:
+            await asyncio.sleep(0.1)
+        except asyncio.CancelledError:
+            cancelled.append(prompt)
+            raise
+        return "ok"
+
+    batcher = summarizer._GenerateBatcher(fake_send, max_batch=1, max_wait_ms=0)  # type: ignore[attr-defined]
+
+    def generate(prompt: str) -> "asyncio.Future[str]":
+        return asyncio.ensure_future(batcher.generate(("http://ollama", {"prompt": prompt})))
+
+    try:
+        running, queued = generate("running"), generate("queued")
+        await asyncio.sleep(0.02)
+        running.cancel()  # in flight: its send is cancelled and the slot freed
+        queued.cancel()  # still queued: never sent
+        assert await generate("next") == "ok"
+    finally:
+        await batcher.aclose()
+
+    assert sent == ["running", "next"]
+    assert cancelled == ["running"]
+
+
+async def test_generate_batcher_keeps_its_client_when_restarting_the_dispatcher() -> None:
+    async def fake_send(_client: Any, request: Any) -> str:
+        return "ok"
+
+    batcher = summarizer._GenerateBatcher(fake_send, max_wait_ms=0)  # type: ignore[attr-defined]
+    try:
+        await batcher.generate(("http://ollama", {"prompt": "p"}))
+        client = batcher._client
+        batcher._dispatcher.cancel()
+        await asyncio.sleep(0)
+
+        assert await batcher.generate(("http://ollama", {"prompt": "p"})) == "ok"
+        assert batcher._client is client and not client.is_closed
+    finally:
+        await batcher.aclose()
+
+
+def test_generate_batcher_closes_the_client_of_a_previous_loop() -> None:
+    async def fake_send(_client: Any, request: Any) -> str:
+        return "ok"
+
+    batcher = summarizer._GenerateBatcher(fake_send, max_wait_ms=0)  # type: ignore[attr-defined]
+    old_loop, new_loop = asyncio.new_event_loop(), asyncio.new_event_loop()
+    try:
+        old_loop.run_until_complete(batcher.generate(("http://ollama", {"prompt": "p"})))
+        old_client, old_dispatcher = batcher._client, batcher._dispatcher
+
+        assert new_loop.run_until_complete(batcher.generate(("http://ollama", {"prompt": "p"}))) == "ok"
+        old_dispatcher.cancel()
+        old_loop.run_until_complete(asyncio.sleep(0.01))  # runs the close handed back to it
+
+        assert old_client.is_closed
+        assert batcher._client is not old_client
+        new_loop.run_until_complete(batcher.aclose())
+    finally:
+        old_loop.close()
+        new_loop.close()
+
+
+def test_extract_readable_text_keeps_blocks_on_separate_lines() -> None:
+    html = "<body><!-- hidden --><h2>Heading</h2><p>First <i>para</i>.</p><ul><li>One</li><li>Two</li></ul></body>"
+
+    text = summarizer._extract_readable_text(html)  # type: ignore[attr-defined]
+
+    assert "hidden" not in text
+    assert text.split("\n\n") == ["Heading", "First para.", "One", "Two"]
+
+
+@pytest.mark.parametrize(
+    ("html", "expected"),
+    [
+        ("<nav><a>Home</a><a>About</a></nav>", "Home About"),
+        ("<dl><dt>Term</dt><dd>Definition</dd></dl>", "Term\n\nDefinition"),
+        ("<p><span>Hello</span><span>world</span></p>", "Hello world"),
+        ("<p>Hello <b>world</b>! See (<a>this</a>), <i>ok</i>.</p>", "Hello world! See (this), ok."),
+        ("<head><title>Page</title></head><body><h1>Heading</h1></body>", "Page\n\nHeading"),
+        # Spacing the author wrote is left as is
+        ("<p>Price : <b>5</b> ( approx )</p>", "Price : 5 ( approx )"),
+        ("<p><b>Price</b> : 5 ( <i>approx</i> )</p>", "Price : 5 ( approx )"),
+    ],
+)
+def test_extract_readable_text_separates_adjacent_elements(html: str, expected: str) -> None:
+    assert summarizer._extract_readable_text(html) == expected  # type: ignore[attr-defined]
+
+
+@pytest.mark.parametrize("max_chars", [1, 7, 8, 9, 50, 0])
+def test_collapse_head_matches_collapsing_whole_text(max_chars: int) -> None:
+    # Window boundaries land inside whitespace runs and between words
+    text = "  lead \n\n " + "word \t\n  \n\n  next.  " * 40 + " \n tail "
+    full = summarizer.collapse_whitespace(text).strip()
+
+    head = summarizer._collapse_head(text, max_chars)  # type: ignore[attr-defined]
+    assert head == (full[:max_chars] if max_chars else full)
+
+
+def test_finalize_summary_word_cap_keeps_paragraphs() -> None:
+    text = "One two three.\n\nFour five six. Seven eight nine"
+    finalized = summarizer._finalize_summary_text(text, max_words=7)  # type: ignore[attr-defined]
+    assert finalized == "One two three.\n\nFour five six."
+
+
+async def test_warm_up_model_pins_model_with_single_token(monkeypatch: pytest.MonkeyPatch) -> None:
+    captured: Dict[str, Any] = {}
+
+    async def fake_send(_client: Any, request: Any) -> str:
+        captured.update(request[1])
+        return "ok"
+
+    batcher = summarizer._GenerateBatcher(fake_send, max_wait_ms=0)  # type: ignore[attr-defined]
+    monkeypatch.setattr(summarizer, "_batcher", batcher)
+    try:
+        await summarizer.warm_up_model("gemma3:1b")
+    finally:
+        await batcher.aclose()
+
+    assert captured["model"] == "gemma3:1b"
+    assert captured["keep_alive"] == -1
+    assert captured["options"]["num_predict"] == 1
+    # Same context size as real jobs, so Ollama doesn't reload the model for the first one
+    assert captured["options"]["num_ctx"] == summarizer.OLLAMA_NUM_CTX
+
+
+async def test_summarize_with_gemma3_reuses_cached_summary(monkeypatch: pytest.MonkeyPatch) -> None:
+    class FakeCache:
+        def __init__(self) -> None:
+            self.values: Dict[str, str] = {}
+
+        async def get(self, key: str) -> Any:
+            return self.values.get(key)
+
+        async def set(self, key: str, value: str, ex: int | None = None) -> None:
+            self.values[key] = value
+
+    calls = 0
+
+    async def fake_send(_client: Any, _request: Any) -> str:
+        nonlocal calls
+        calls += 1
+        return "A cached summary."
+
+    batcher = summarizer._GenerateBatcher(fake_send, max_wait_ms=0)  # type: ignore[attr-defined]
+    monkeypatch.setattr(summarizer, "_batcher", batcher)
+    cache = FakeCache()
+    html = "<p>" + " ".join(["content"] * 60) + "</p>"
+
+    try:
+        first = await summarizer.summarize_with_gemma3(html, cache=cache)  # type: ignore[arg-type]
+        second = await summarizer.summarize_with_gemma3(html, cache=cache)  # type: ignore[arg-type]
+    finally:
+        await batcher.aclose()
+
+    assert first == second == "A cached summary."
+    assert calls == 1
+    assert all(key.startswith("summary:") for key in cache.values)
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["", "a  b", "a \n b", "a \t\n \n\n\t b", "x\n\xa0\nend.", " lead\r\n\r\ntrail ", "no end"],
+)
+def test_compiled_text_scans_match_python_fallback(text: str) -> None:
+    speedups = pytest.importorskip("background_tasks._speedups")
+
+    assert speedups.collapse_whitespace(text) == summarizer._collapse_whitespace_py(text)  # type: ignore[attr-defined]
+    assert speedups.find_last_sentence_end(text) == summarizer._find_last_sentence_end_py(text)  # type: ignore[attr-defined]